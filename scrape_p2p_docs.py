@@ -1,12 +1,21 @@
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
 import re
 import time
-import random
 import logging
 import os
+import posixpath
+import queue
+import shutil
+import socket
 import sys
+import tempfile
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit, urlunsplit
 
 # Try to import tqdm, and handle the case when it's not installed
 try:
@@ -27,10 +36,27 @@ USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36
 BASE_URL = "https://docs.p2p.org/"
 INITIAL_URL = "https://docs.p2p.org/llms.txt"
 OUTPUT_FILE = "p2p_aggregated_docs.md"
-MAX_WORKERS = 5
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)  # IO-bound pool size
+WORKERS_ENV_VAR = "P2P_SCRAPER_WORKERS"
 MAX_RETRIES = 3
+BODY_RETRIES = 1  # refetches after a body read breaks off, each with its own MAX_RETRIES
 TIMEOUT = 10
-RETRY_DELAY_BASE = 2  # base seconds for exponential backoff
+RETRY_DELAY_BASE = 2  # backoff factor for exponential backoff between retries
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)  # responses worth retrying
+RETRY_DELAY_CAP = 30  # longest wait between attempts, including Retry-After hints
+KEEPALIVE_IDLE = 30  # seconds a pooled socket stays idle before TCP keepalive probes start
+KEEPALIVE_INTERVAL = 10  # seconds between TCP keepalive probes once they have started
+CHUNK_SIZE = 64 * 1024  # bytes read per iteration when streaming responses
+MAX_CONTENT_SIZE = 20 * 1024 * 1024  # responses larger than this are skipped
+OUTPUT_BUFFER_SIZE = 1024 * 1024  # write and copy buffer for the aggregated file
+WRITE_QUEUE_SIZE = 64  # individual files waiting to be written to disk
+PROGRESS_INTERVAL = 0.1  # minimum seconds between plain-text progress updates
+
+# Pattern to match markdown links: [text](url.md)
+# Excluding brackets from the text and parentheses from the URL bounds every match
+# attempt to the next `[` or `(`, so the scan stays linear on malformed input
+# It runs on raw bytes so the index file never has to be decoded as a whole
+_MD_LINK_RE = re.compile(rb"\[[^\[\]]*\]\(([^()]+?\.md)\)")
 
 # Configure logging
 logging.basicConfig(
@@ -43,103 +69,427 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def fetch_url(url, retries=MAX_RETRIES, timeout=TIMEOUT):
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose pooled sockets send TCP keepalive probes while idle, so
+    middleboxes don't silently drop connections between bursts of downloads.
+    """
+    
+    # Keep urllib3's defaults (TCP_NODELAY) and add keepalive on top
+    socket_options = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+    # The probe timing knobs are not available on every platform
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, KEEPALIVE_INTERVAL))
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+class CappedRetry(Retry):
+    """
+    Retry that never waits longer than RETRY_DELAY_CAP between attempts, whether
+    the wait comes from exponential backoff or from a server's Retry-After, so
+    neither many retries nor a very long requested pause can park a worker.
     """
-    Fetch content from a URL with retry logic and error handling.
+    
+    def get_backoff_time(self):
+        return min(RETRY_DELAY_CAP, super().get_backoff_time())
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(RETRY_DELAY_CAP, retry_after)
+
+def create_session(pool_size=DEFAULT_MAX_WORKERS, retries=MAX_RETRIES):
+    """
+    Create a requests session that keeps connections to the docs host alive.
+    
+    Args:
+        pool_size (int): Number of pooled connections to keep per host
+        retries (int): Number of retry attempts for failed requests
+        
+    Returns:
+        requests.Session: A session with a connection-pooling, retrying adapter mounted
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    
+    # Let urllib3 retry connection errors and retryable statuses with exponential
+    # backoff, honoring Retry-After up to RETRY_DELAY_CAP. The last response is
+    # returned instead of raising so fetch_url can log its status.
+    retry = CappedRetry(
+        total=retries,
+        backoff_factor=RETRY_DELAY_BASE,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = KeepAliveAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def read_body(response, max_size=MAX_CONTENT_SIZE):
+    """
+    Read a streamed response body in chunks, stopping once it exceeds a size limit.
+    
+    Args:
+        response (requests.Response): A response opened with stream=True
+        max_size (int): Maximum number of bytes to accept
+        
+    Returns:
+        bytearray or None: The body if it fits within max_size, None otherwise
+    """
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        return None
+    
+    body = bytearray()
+    for chunk in response.iter_content(CHUNK_SIZE):
+        body += chunk
+        if len(body) > max_size:
+            return None
+    return body
+
+def fetch_url(session, url, body_retries=BODY_RETRIES, timeout=TIMEOUT, max_size=MAX_CONTENT_SIZE, as_bytes=False):
+    """
+    Fetch content from a URL with error handling.
+    
+    Connection errors and retryable statuses are retried by the session's
+    adapter (see create_session). The body is streamed after the adapter has
+    returned, so a read that breaks off midway is refetched here instead. Each
+    refetch gets the adapter's full retry budget again, so one URL can take up
+    to (MAX_RETRIES + 1) * (body_retries + 1) requests.
     
     Args:
+        session (requests.Session): The session used to issue the request
         url (str): The URL to fetch
-        retries (int): Number of retry attempts
+        body_retries (int): Number of refetches after an interrupted body read
         timeout (int): Request timeout in seconds
+        max_size (int): Maximum response size in bytes
+        as_bytes (bool): Return the raw body instead of decoding it as UTF-8
         
     Returns:
-        str or None: The text content if successful, None otherwise
+        str, bytes or None: The content if successful, None otherwise
     """
-    headers = {"User-Agent": USER_AGENT}
-    
-    for attempt in range(retries + 1):
+    for attempt in range(body_retries + 1):
         try:
-            logger.debug(f"Fetching {url} (Attempt {attempt + 1}/{retries + 1})")
-            response = requests.get(url, headers=headers, timeout=timeout)
+            logger.debug(f"Fetching {url} (Attempt {attempt + 1}/{body_retries + 1})")
+            response = session.get(url, timeout=timeout, stream=True)
             
-            if response.status_code == 200:
-                return response.text
-            elif response.status_code == 404:
-                logger.warning(f"Resource not found (404): {url}")
-                return None  # Don't retry for 404s
-            else:
-                logger.warning(f"Failed to fetch {url}: HTTP {response.status_code}")
+            try:
+                if response.status_code == 200:
+                    try:
+                        body = read_body(response, max_size)
+                    except (requests.exceptions.ChunkedEncodingError, requests.ConnectionError) as e:
+                        # Connection reset, truncated body or read timeout while streaming
+                        if attempt == body_retries:
+                            raise
+                        delay = min(RETRY_DELAY_CAP, RETRY_DELAY_BASE * 2 ** attempt)
+                        logger.warning(f"Interrupted while reading {url}: {e}. Retrying in {delay} seconds...")
+                        time.sleep(delay)
+                        continue
+                    
+                    if body is None:
+                        logger.warning(f"Skipping {url}: response larger than {max_size} bytes")
+                        return None
+                    if as_bytes:
+                        return bytes(body)
+                    # The docs are served as UTF-8, so skip requests' encoding detection
+                    return body.decode("utf-8", errors="replace")
+                elif response.status_code == 404:
+                    logger.warning(f"Resource not found (404): {url}")
+                else:
+                    logger.error(f"Failed to fetch {url}: HTTP {response.status_code}")
+            finally:
+                response.close()
                 
         except requests.Timeout:
-            logger.warning(f"Timeout error fetching {url}")
+            logger.error(f"Timeout error fetching {url}")
         except requests.ConnectionError:
-            logger.warning(f"Connection error fetching {url}")
+            logger.error(f"Connection error fetching {url}")
         except requests.RequestException as e:
-            logger.warning(f"Error fetching {url}: {e}")
-            
-        if attempt < retries:
-            # Exponential backoff with jitter
-            delay = RETRY_DELAY_BASE ** attempt + random.uniform(0, 1)
-            logger.info(f"Retrying in {delay:.2f} seconds...")
-            time.sleep(delay)
-    
-    logger.error(f"Failed to fetch {url} after {retries + 1} attempts")
-    return None
+            logger.error(f"Error fetching {url}: {e}")
+        
+        # Only an interrupted body read loops back for another attempt
+        return None
 
-def extract_md_links(text_content):
+def canonicalize_url(url):
     """
-    Extract all markdown links from text content.
+    Normalize a URL so that equivalent spellings compare equal.
+    
+    Lowercases the scheme and host, drops the fragment, and collapses
+    duplicate slashes and `.`/`..` segments in the path.
     
     Args:
-        text_content (str): The text content to search for markdown links
+        url (str): An absolute URL
+        
+    Returns:
+        str: The canonical form of the URL
+    """
+    parts = urlsplit(url)
+    path = parts.path
+    if path:
+        path = posixpath.normpath(re.sub(r'/{2,}', '/', path))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+def extract_md_links(content):
+    """
+    Extract all markdown links from raw content.
+    
+    Args:
+        content (bytes): The UTF-8 encoded content to search for markdown links
         
     Returns:
         set: A set of unique markdown file URLs
     """
-    if not text_content:
+    if not content:
         return set()
     
-    # Pattern to match markdown links: [text](url.md)
-    # This will find both relative and absolute URLs ending with .md
-    pattern = r'\[.*?\]\((.*?\.md)\)'
-    matches = re.findall(pattern, text_content)
-    
-    # Convert relative URLs to absolute URLs
+    # Find both relative and absolute URLs ending with .md, converting
+    # relative ones to absolute URLs and canonicalizing them so the same
+    # document is never downloaded twice
     absolute_urls = set()
-    for match in matches:
-        if match.startswith(('http://', 'https://')):
-            absolute_urls.add(match)
-        else:
-            absolute_urls.add(urljoin(BASE_URL, match))
+    for match in _MD_LINK_RE.finditer(content):
+        raw_link = match.group(1)
+        # Only captured links are decoded, and absolute ones skip urljoin entirely
+        link = raw_link.decode('utf-8', errors='replace')
+        if not raw_link.startswith((b'http://', b'https://')):
+            link = urljoin(BASE_URL, link)
+        absolute_urls.add(canonicalize_url(link))
     
     logger.info(f"Found {len(absolute_urls)} unique markdown links")
     return absolute_urls
 
-def download_md_file(url):
+def download_md_file(session, url):
     """
     Download a markdown file from a URL.
     
     Args:
+        session (requests.Session): The session used to issue the request
         url (str): The URL of the markdown file
         
     Returns:
-        tuple: (url, content) where content is the file content or None if failed
+        tuple: (url, content) where content is the file content as valid UTF-8
+            bytes or None if failed
     """
-    content = fetch_url(url)
+    # Keep the body as bytes so it never has to be re-encoded for the files it
+    # is written to; non-ASCII bodies are still decoded once below to validate UTF-8
+    try:
+        content = fetch_url(session, url, as_bytes=True)
+    except Exception as exc:
+        # Report the URL here, since callers only get it back through the return value
+        logger.error(f"An error occurred with {url}: {exc}")
+        return url, None
+    
+    if content and not content.isascii():
+        try:
+            content.decode('utf-8')
+        except UnicodeDecodeError:
+            # Same replacement the text path applies, so the output stays valid UTF-8
+            logger.warning(f"Invalid UTF-8 in {url}, replacing undecodable bytes")
+            content = content.decode('utf-8', errors='replace').encode('utf-8')
     
     if content:
         return url, content
     else:
         return url, None
 
-def main():
+def document_title(url):
+    """
+    Derive the section title and table of contents anchor for a markdown URL.
+    
+    Args:
+        url (str): The URL of the markdown file
+        
+    Returns:
+        tuple: (title, anchor)
+    """
+    title = os.path.basename(url).replace('.md', '').replace('-', ' ').title()
+    return title, title.lower().replace(' ', '-')
+
+def write_files(write_queue):
+    """
+    Write queued markdown files to disk until a None sentinel is received.
+    
+    Args:
+        write_queue (queue.Queue): Queue of (filepath, content) tuples with bytes content
+    """
+    while True:
+        item = write_queue.get()
+        if item is None:
+            break
+        
+        filepath, content = item
+        try:
+            # Binary mode: line endings are written as served, with no platform translation
+            with open(filepath, 'wb') as f:
+                f.write(content)
+        except OSError as exc:
+            logger.error(f"Failed to save {filepath}: {exc}")
+
+def download_all(session, md_links, body_file, md_files_dir=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Download markdown files concurrently, streaming each one into the aggregated
+    body as it completes and optionally saving it individually.
+    
+    Args:
+        session (requests.Session): The session shared by all downloads
+        md_links (set): The markdown file URLs to download
+        body_file (file): Binary file that receives one section per downloaded document
+        md_files_dir (str or None): Directory where individual files are saved,
+            or None to skip saving them
+        max_workers (int): Number of downloads kept in flight at once
+        
+    Returns:
+        tuple: (sections, failed_urls) where sections is a list of (url, title, anchor)
+            in the order they were written to body_file
+    """
+    sections = []
+    failed_urls = []
+    total = len(md_links)
+    
+    if TQDM_AVAILABLE:
+        progress_bar = tqdm(total=total, desc="Downloading files", unit="file")
+    else:
+        # Fallback to simple progress tracking if tqdm is not available
+        progress_bar = None
+        last_print = 0.0
+        print(f"Downloading {total} files:")
+    
+    # Individual files are written by a single thread so the result loop never blocks on disk
+    write_queue = None
+    writer = None
+    if md_files_dir is not None:
+        write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        writer = threading.Thread(target=write_files, args=(write_queue,), name="md-writer", daemon=True)
+        writer.start()
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Submit all download tasks; each future returns its own URL
+        futures = [executor.submit(download_md_file, session, url) for url in md_links]
+        
+        # Process results as they complete
+        for completed, future in enumerate(as_completed(futures), 1):
+            # download_md_file handles its own errors, so this only raises on a bug
+            url, content = future.result()
+            try:
+                if content:
+                    # Build the whole section first so each document is a single write
+                    title, anchor = document_title(url)
+                    body_file.write(b"".join([
+                        f"## {title}\n\n*Source: [{url}]({url})*\n\n".encode('utf-8'),
+                        content,
+                        b"\n\n---\n\n",
+                    ]))
+                    sections.append((url, title, anchor))
+                    
+                    # Save individual markdown file (optional)
+                    if write_queue is not None:
+                        filename = os.path.basename(url)
+                        write_queue.put((os.path.join(md_files_dir, filename), content))
+                else:
+                    failed_urls.append(url)
+                    logger.error(f"Failed to download: {url}")
+            except Exception as exc:
+                failed_urls.append(url)
+                logger.error(f"An error occurred with {url}: {exc}")
+            finally:
+                if progress_bar is not None:
+                    progress_bar.update(1)
+                else:
+                    # Print progress percentage, throttled so fast downloads don't flood stdout
+                    now = time.monotonic()
+                    if now - last_print >= PROGRESS_INTERVAL or completed == total:
+                        last_print = now
+                        progress = (completed / total) * 100
+                        sys.stdout.write(f"Progress: {progress:.1f}% ({completed}/{total})\r")
+                        sys.stdout.flush()
+    
+    if writer is not None:
+        write_queue.put(None)
+        writer.join()
+    
+    if progress_bar is not None:
+        progress_bar.close()
+    else:
+        print()  # New line after progress indicator
+    
+    return sections, failed_urls
+
+def positive_int(value):
+    """
+    Parse a command-line value as a strictly positive integer.
+    
+    Args:
+        value (str): The raw value to parse
+        
+    Returns:
+        int: The parsed value
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer value: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def parse_args(argv=None):
+    """
+    Parse command-line arguments.
+    
+    Args:
+        argv (list): Arguments to parse, defaults to sys.argv[1:]
+        
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Aggregate the P2P.org documentation into a single markdown file.")
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        # argparse runs string defaults through `type`, so the env var is validated too
+        default=os.environ.get(WORKERS_ENV_VAR, DEFAULT_MAX_WORKERS),
+        help=f"Maximum number of concurrent downloads (default: ${WORKERS_ENV_VAR} or {DEFAULT_MAX_WORKERS}; "
+             "8-32 works well, higher values mostly add load on the server)",
+    )
+    parser.add_argument(
+        "--save-individual",
+        action="store_true",
+        help="Also save each markdown file separately in the markdown_files directory",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function to orchestrate the scraping process."""
+    args = parse_args(argv)
+    session = create_session(args.workers)
+    try:
+        run(session, args)
+    finally:
+        session.close()
+
+def run(session, args):
+    """
+    Run the scraping process using the given session.
+    
+    Args:
+        session (requests.Session): The session shared by all downloads
+        args (argparse.Namespace): The parsed command-line arguments
+    """
     start_time = time.time()
     logger.info("Starting P2P documentation scraping")
     
     # Step 1: Fetch the initial text file
     logger.info(f"Fetching main file: {INITIAL_URL}")
-    main_content = fetch_url(INITIAL_URL)
+    main_content = fetch_url(session, INITIAL_URL, as_bytes=True)
     
     if not main_content:
         logger.error("Failed to fetch the main file. Exiting.")
@@ -154,117 +504,57 @@ def main():
         return
     
     # Step 3: Download markdown files concurrently
-    logger.info(f"Downloading {len(md_links)} markdown files using {MAX_WORKERS} workers")
-    results = []
-    failed_urls = []
+    # Never start more workers than there are files to download
+    workers = min(args.workers, max(1, len(md_links)))
+    logger.info(f"Downloading {len(md_links)} markdown files using {workers} workers")
     
     # Create a directory to store individual markdown files (optional)
-    md_files_dir = "markdown_files"
-    if not os.path.exists(md_files_dir):
-        os.makedirs(md_files_dir)
-    
-    # Use ThreadPoolExecutor with progress bar
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Submit all download tasks
-        future_to_url = {executor.submit(download_md_file, url): url for url in md_links}
-        
-        # Process results as they complete with a progress bar
-        if TQDM_AVAILABLE:
-            # Use tqdm if available
-            with tqdm(total=len(md_links), desc="Downloading files", unit="file") as progress_bar:
-                for future in as_completed(future_to_url):
-                    url = future_to_url[future]
-                    try:
-                        url, content = future.result()
-                        if content:
-                            results.append((url, content))
-                            
-                            # Save individual markdown file (optional)
-                            filename = os.path.basename(url)
-                            filepath = os.path.join(md_files_dir, filename)
-                            with open(filepath, 'w', encoding='utf-8') as f:
-                                f.write(content)
-                        else:
-                            failed_urls.append(url)
-                            logger.error(f"Failed to download: {url}")
-                    except Exception as exc:
-                        failed_urls.append(url)
-                        logger.error(f"An error occurred with {url}: {exc}")
-                    finally:
-                        progress_bar.update(1)
-        else:
-            # Fallback to simple progress tracking if tqdm is not available
-            total = len(md_links)
-            completed = 0
-            
-            print(f"Downloading {total} files:")
-            
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
-                completed += 1
-                
-                # Print progress percentage
-                progress = (completed / total) * 100
-                print(f"Progress: {progress:.1f}% ({completed}/{total})", end='\r')
-                
-                try:
-                    url, content = future.result()
-                    if content:
-                        results.append((url, content))
-                        
-                        # Save individual markdown file
-                        filename = os.path.basename(url)
-                        filepath = os.path.join(md_files_dir, filename)
-                        with open(filepath, 'w', encoding='utf-8') as f:
-                            f.write(content)
-                    else:
-                        failed_urls.append(url)
-                        logger.error(f"Failed to download: {url}")
-                except Exception as exc:
-                    failed_urls.append(url)
-                    logger.error(f"An error occurred with {url}: {exc}")
-            
-            print()  # New line after progress indicator
+    md_files_dir = None
+    if args.save_individual:
+        md_files_dir = "markdown_files"
+        os.makedirs(md_files_dir, exist_ok=True)
     
-    success_count = len(results)
-    failure_count = len(failed_urls)
-    
-    logger.info(f"Successfully downloaded {success_count} out of {len(md_links)} files")
-    if failure_count > 0:
-        logger.warning(f"Failed to download {failure_count} files")
-    
-    # Step 4: Aggregate content into a single markdown file
-    logger.info(f"Aggregating content into {OUTPUT_FILE}")
-    
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        f.write("# P2P.org Aggregated Documentation\n\n")
-        f.write(f"*This file contains aggregated documentation from {success_count} markdown files.*\n\n")
-        f.write(f"*Generated on: {time.strftime('%Y-%m-%d %H:%M:%S')}*\n\n")
+    # Sections are streamed into a temporary body file as downloads complete, so
+    # disk writes overlap with the network and documents are not held in memory.
+    # It lives next to the output file to keep the final copy on the same disk.
+    output_dir = os.path.dirname(os.path.abspath(OUTPUT_FILE))
+    with tempfile.TemporaryFile('w+b', buffering=OUTPUT_BUFFER_SIZE, dir=output_dir) as body_file:
+        sections, failed_urls = download_all(
+            session, md_links, body_file, md_files_dir, max_workers=workers
+        )
+        
+        success_count = len(sections)
+        failure_count = len(failed_urls)
         
-        # Add table of contents
-        f.write("## Table of Contents\n\n")
-        for i, (url, _) in enumerate(results, 1):
-            filename = os.path.basename(url)
-            title = filename.replace('.md', '').replace('-', ' ').title()
-            f.write(f"{i}. [{title}](#{title.lower().replace(' ', '-')})\n")
+        logger.info(f"Successfully downloaded {success_count} out of {len(md_links)} files")
+        if failure_count > 0:
+            logger.warning(f"Failed to download {failure_count} files")
         
-        f.write("\n---\n\n")
+        # Step 4: Aggregate content into a single markdown file
+        logger.info(f"Aggregating content into {OUTPUT_FILE}")
         
-        # Add content of each file
-        for url, content in results:
-            filename = os.path.basename(url)
-            title = filename.replace('.md', '').replace('-', ' ').title()
+        # Binary mode keeps line endings exactly as served (LF) on every platform
+        with open(OUTPUT_FILE, 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+            # Collect the header and table of contents, then write them in one call
+            parts = [
+                "# P2P.org Aggregated Documentation\n\n",
+                f"*This file contains aggregated documentation from {success_count} markdown files.*\n\n",
+                f"*Generated on: {time.strftime('%Y-%m-%d %H:%M:%S')}*\n\n",
+                "## Table of Contents\n\n",
+            ]
+            for i, (_, title, anchor) in enumerate(sections, 1):
+                parts.append(f"{i}. [{title}](#{anchor})\n")
+            parts.append("\n---\n\n")
+            f.write("".join(parts).encode('utf-8'))
             
-            f.write(f"## {title}\n\n")
-            f.write(f"*Source: [{url}]({url})*\n\n")
-            f.write(content)
-            f.write("\n\n---\n\n")
+            # Append the content of each file in a single buffered copy
+            body_file.seek(0)
+            shutil.copyfileobj(body_file, f, OUTPUT_BUFFER_SIZE)
     
     # Write failed URLs to a separate file if any
     if failed_urls:
         with open("failed_urls.txt", 'w', encoding='utf-8') as f:
-            for url in failed_urls:
-                f.write(f"{url}\n")
+            f.write("".join(f"{url}\n" for url in failed_urls))
         logger.info(f"List of failed URLs saved to failed_urls.txt")
     
     end_time = time.time()